@@ -6,10 +6,11 @@ class ScreenCapture:
     def __init__(self):
         pass
 
-    def capture(self, region):
+    def capture(self, region, out=None):
         """
         Captures a screenshot of the specified region.
         :param region: Tuple (x, y, width, height) or dictionary with 'top', 'left', 'width', 'height'
+        :param out: Optional preallocated (height, width, 3) uint8 array to fill in place.
         :return: Numpy array representing the image (BGR format for OpenCV)
         """
         # mss requires a dictionary for region: {'top': y, 'left': x, 'width': w, 'height': h}
@@ -27,10 +28,8 @@ class ScreenCapture:
         with mss.mss() as sct:
             sct_img = sct.grab(monitor)
             
-            # Convert to numpy array
-            img = np.array(sct_img)
+            # View the raw BGRA bytes as a numpy array (no copy)
+            img = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(sct_img.height, sct_img.width, 4)
             
-            # Convert BGRA to BGR
-            img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-            
-            return img
+            # Convert BGRA to BGR, writing into the caller's buffer if provided
+            return cv2.cvtColor(img, cv2.COLOR_BGRA2BGR, dst=out)
@@ -3,6 +3,7 @@ import os
 import threading
 import queue
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 class ChessEngine:
     """
@@ -19,8 +20,10 @@ class ChessEngine:
         self.engine_path = engine_path
         self.process = None
         self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
         self._output_queue = queue.Queue()
         self._reader_thread = None
+        self._executor = None  # Worker for analyze_async, created on first use
 
     def start(self):
         """Starts the Stockfish engine process."""
@@ -93,6 +96,12 @@ class ChessEngine:
 
     def stop(self):
         """Stops the engine process."""
+        # End any running search so we don't wait out its movetime for the lock,
+        # and drop searches that were queued behind it
+        self.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
         with self._lock:
             if self.process and self._is_alive():
                 try:
@@ -105,12 +114,14 @@ class ChessEngine:
 
     def _send(self, command):
         """Send a command to the engine."""
-        if self.process and self._is_alive():
-            try:
-                self.process.stdin.write(command + "\n")
-                self.process.stdin.flush()
-            except (OSError, BrokenPipeError):
-                pass
+        proc = self.process
+        if proc and proc.poll() is None:
+            with self._write_lock:
+                try:
+                    proc.stdin.write(command + "\n")
+                    proc.stdin.flush()
+                except (OSError, BrokenPipeError):
+                    pass
 
     def _read_line(self, timeout=5.0):
         """Read one line from the output queue with timeout. Returns None on timeout/EOF."""
@@ -202,3 +213,19 @@ class ChessEngine:
                 print(f"Analysis error: {e}")
                 self._cleanup_process()
                 return None
+
+    def analyze_async(self, fen, time_limit=1.0, skill_level=None):
+        """
+        Runs analyze() on the engine's worker thread.
+        :return: concurrent.futures.Future resolving to the best move string or None.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="engine")
+        return self._executor.submit(self.analyze, fen, time_limit, skill_level)
+
+    def cancel(self):
+        """
+        Asks a running search to finish early. Safe to call without holding the
+        lock; the caller is expected to discard the cut-short result.
+        """
+        self._send("stop")
@@ -1,3 +1,4 @@
+import hashlib
 import cv2
 import numpy as np
 
@@ -6,6 +7,7 @@ class BoardVision:
         self.templates = {} # Maps piece symbol (e.g. 'P', 'k') + square_color (0/1) -> image
         self.square_size = 0
         self.is_calibrated = False
+        self._last_thumb_hash = None
 
     def split_board(self, image):
         """
@@ -35,6 +37,7 @@ class BoardVision:
         """
         squares = self.split_board(image)
         self.templates = {}
+        self._last_thumb_hash = None  # New templates: the next frame must be read
         
         # Standard starting position (from top-left)
         # White bottom: r n b q k b n r (row 0 - Black)
@@ -87,6 +90,17 @@ class BoardVision:
         self.is_calibrated = True
         print(f"Calibration complete. Templates stored: {len(self.templates)}")
 
+    def quick_changed(self, thumb):
+        """
+        Cheap change check ahead of a full read.
+        :param thumb: Small downsampled copy of the board image.
+        :return: True if it differs from the thumbnail seen on the previous call.
+        """
+        thumb_hash = hashlib.blake2s(thumb.tobytes(), digest_size=8).digest()
+        changed = thumb_hash != self._last_thumb_hash
+        self._last_thumb_hash = thumb_hash
+        return changed
+
     def _is_check_highlight(self, sq_img):
         """
         Detects the deep red/maroon highlight chess.com uses for a king in check.
@@ -103,6 +117,17 @@ class BoardVision:
         return False
 
     def get_board_state(self, image, orientation='white'):
+        board_part = self.get_board_part(image, orientation)
+        if board_part is None:
+            return None
+        return board_part + " w KQkq - 0 1"
+
+    def get_board_part(self, image, orientation='white'):
+        """
+        Reads the piece placement only.
+        :param image: Board image (BGR).
+        :return: Board field of a FEN, or None if not calibrated.
+        """
         if not self.is_calibrated:
             return None
             
@@ -160,6 +185,4 @@ class BoardVision:
                 row_str += str(empty_count)
             fen_rows.append(row_str)
             
-        fen = "/".join(fen_rows)
-        fen += " w KQkq - 0 1" 
-        return fen
+        return "/".join(fen_rows)
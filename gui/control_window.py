@@ -1,19 +1,153 @@
 import sys
+import logging
+import queue
+import threading
+from collections import Counter, OrderedDict, deque
+from functools import lru_cache
 import chess
+import cv2
+import numpy as np
 from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QPushButton, 
                              QLabel, QComboBox, QCheckBox, QGroupBox, QMessageBox)
-from PyQt6.QtCore import Qt, QTimer, QThread, pyqtSignal
+from PyQt6.QtCore import Qt, QRect, QThread, pyqtSignal
 
 # Core Modules
 from core.capture import ScreenCapture
 from core.vision import BoardVision
 from core.engine import ChessEngine
+from gui.overlay import OverlayWindow
 
 CONFIRM_THRESHOLD = 2  # Need this many identical reads out of the rolling window
 WINDOW_SIZE = 5        # Rolling window of recent reads
 DEBUG_INTERVAL = 10    # Print debug info every N frames when stuck
+IDLE_SLEEP_STEP = 150  # ms added to the idle poll interval per static frame
+IDLE_MAX_STEPS = 4     # Cap idle backoff at IDLE_SLEEP_STEP * IDLE_MAX_STEPS
+STAGE_QUEUE_SIZE = 2   # Reads buffered between the vision and sync stages
+THUMB_SIZE = (64, 64)  # Downsampled frame used for change detection
+ANALYSIS_CACHE_SIZE = 256  # Positions whose best move is remembered
+FULL_READ_INTERVAL = 10    # Re-run vision on every Nth unchanged frame to catch drift
+
+log = logging.getLogger(__name__)
+
+# Board FEN digit -> run of empty squares; rank separators are dropped
+_FEN_EXPAND = str.maketrans({**{str(i): "." * i for i in range(1, 9)}, "/": None})
+
+
+@lru_cache(maxsize=256)
+def _expand_fen(board_fen):
+    """
+    Expands a board FEN to one uint8 per square ('.' for empty), ranks joined.
+    The array is read-only since it is shared through the cache.
+    """
+    return np.frombuffer(board_fen.translate(_FEN_EXPAND).encode(), dtype=np.uint8)
+
+
+def _expanded_diff(target, board_fen):
+    """Counts squares differing between an expanded target and a board FEN."""
+    other = _expand_fen(board_fen)
+    if target.size != other.size:
+        return 64
+    return int(np.count_nonzero(target != other))
+
+
+def _put_while_running(owner, q, item):
+    """Blocking put that gives up once the owning AnalysisThread stops."""
+    while owner.running:
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+class _CaptureThread(QThread):
+    """
+    Pipeline stage 1: grabs the board region into owner.frame_q. The queue holds
+    a single frame and a newer grab replaces an unread one, so vision always
+    works on the freshest frame.
+    """
+
+    def __init__(self, owner):
+        super().__init__()
+        self.owner = owner
+
+    def _take_buffer(self, region):
+        """Returns a free frame buffer for region, allocating if none fits."""
+        h, w = int(region[3]), int(region[2])
+        try:
+            buf = self.owner.free_frames.get_nowait()
+            if buf.shape[:2] == (h, w):
+                return buf
+        except queue.Empty:
+            pass
+        # Pool empty, or the region changed and the old buffer is dropped
+        return np.empty((h, w, 3), dtype=np.uint8)
+
+    def _publish(self, frame):
+        """Hands frame to vision, recycling an older frame vision never picked up."""
+        owner = self.owner
+        try:
+            owner.free_frames.put(owner.frame_q.get_nowait())
+        except queue.Empty:
+            pass
+        owner.frame_q.put_nowait(frame)  # Only this thread puts, so there is room
+
+    def run(self):
+        owner = self.owner
+        while owner.running:
+            region = owner.region
+            if not region:
+                # Woken early by set_region() or stop()
+                owner._wake.wait(timeout=0.5)
+                owner._wake.clear()
+                continue
+            frame = owner.capture_tool.capture(region, out=self._take_buffer(region))
+            self._publish(frame)
+            # The sync stage sets the pace (faster while moves are coming in);
+            # set_region() and stop() cut a long idle wait short
+            if owner._wake.wait(owner._poll_ms / 1000):
+                owner._wake.clear()
+
+
+class _VisionThread(QThread):
+    """Pipeline stage 2: turns frames from owner.frame_q into board reads on owner.read_q."""
+
+    def __init__(self, owner):
+        super().__init__()
+        self.owner = owner
+
+    def run(self):
+        owner = self.owner
+        board_part = None
+        unchanged = 0
+        while owner.running:
+            try:
+                frame = owner.frame_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            # One area-averaged pass; the thumbnail is what gets hashed
+            thumb = cv2.resize(frame, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+            changed = owner.vision.quick_changed(thumb)
+            # The thumbnail hash outlives a Stop/Start, but this thread has no
+            # read of its own yet: the first frame (and any after a failed
+            # read) must go through vision rather than forward None
+            if board_part is not None and not changed and unchanged < FULL_READ_INTERVAL:
+                unchanged += 1  # Same pixels, same read: skip vision
+            else:
+                # None (no read) is forwarded too; the sync stage tracks stalls
+                board_part = owner.vision.get_board_part(frame, owner.side)
+                unchanged = 0
+            owner.free_frames.put(frame)  # Done with the pixels
+            _put_while_running(owner, owner.read_q, board_part)
+
 
 class AnalysisThread(QThread):
+    """
+    Pipeline stage 3: confirms reads, tracks the game on a virtual board and
+    drives the engine. Capture and vision run in their own stage threads so
+    the next frame is grabbed while this one is being processed.
+    """
+    _START_BOARD_FEN = chess.STARTING_BOARD_FEN
     fen_updated = pyqtSignal(str, str) # FEN, Best Move
     move_detected = pyqtSignal()      # Signal to clear markers
 
@@ -24,228 +158,463 @@ class AnalysisThread(QThread):
         self.engine = engine
         self.running = False
         self.region = None
+        self._wake = threading.Event()  # Set when the capture stage should stop waiting
         self.side = 'white'
+        self._my_side_code = 'w'   # FEN turn codes, derived from side in run()
+        self._opp_side_code = 'b'
         self.last_analyzed_board = None  # Board part only (no side/castling)
-        self.recent_reads = []  # Rolling window of recent board reads
+        self._last_analyzed_read = None  # Confirmed read that produced last_analyzed_board
+        self._last_confirmed_board = None  # Last confirmed read that synced successfully
+        self._sync_cache = {}  # (board FEN, read) -> True (noisy stay) or min legal diff
+        self._reachable = None  # Boards one legal move away, see _reachable_boards()
+        self.recent_reads = deque(maxlen=WINDOW_SIZE)  # Rolling window of recent board reads
+        self._read_counts = {}  # Read -> occurrences in recent_reads
+        self._best_read = None  # Read with the highest count in the window
         self._stall_counter = 0  # Count frames without a new confirmed FEN
+        self.frame_q = queue.Queue(maxsize=1)  # capture -> vision, latest frame only
+        self.free_frames = queue.SimpleQueue()  # Frame buffers vision has released
+        self.read_q = queue.Queue(maxsize=STAGE_QUEUE_SIZE)   # vision -> sync
+        self._poll_ms = 100  # Capture interval requested by the sync stage
+        self._pending_analysis = None  # Future for the in-flight engine search
+        self._pending_fen = None       # Full FEN that search was started for
+        self._last_emitted = (None, None)  # (fen, best_move) currently shown
+        self._idle_steps = 0  # Backoff level while waiting on a static board
+        self.strict_validate = False  # Re-check engine moves against legal_moves
+        self._analysis_cache = OrderedDict()  # Full FEN -> best move (LRU)
         
         # Stateful tracking
         self.virtual_board = chess.Board()
+        self._board_fen_cache = None  # virtual_board.board_fen(), until it changes
+        self._fen_cache = None        # virtual_board.fen(), until it changes
         self._desync_frames = 0
         self._last_logged_status = None
 
 
-    def _board_diff_count(self, fen1, fen2):
-        """Counts how many squares differ between two board FEN strings."""
-        def expand_fen(f):
-            result = []
-            for char in f:
-                if char.isdigit():
-                    result.extend(['.'] * int(char))
-                else:
-                    result.append(char)
-            return "".join(result).replace("/", "")
-        
-        s1 = expand_fen(fen1)
-        s2 = expand_fen(fen2)
-        if len(s1) != len(s2):
-            return 64
-        return sum(1 for a, b in zip(s1, s2) if a != b)
+    def _board_changed(self):
+        """Drops everything derived from the previous virtual board state."""
+        self._sync_cache.clear()
+        self._reachable = None
+        self._board_fen_cache = None
+        self._fen_cache = None
+
+    def _board_fen(self):
+        """virtual_board.board_fen(), serialized once per board state."""
+        if self._board_fen_cache is None:
+            self._board_fen_cache = self.virtual_board.board_fen()
+        return self._board_fen_cache
+
+    def _full_fen(self):
+        """virtual_board.fen(), serialized once per board state."""
+        if self._fen_cache is None:
+            self._fen_cache = self.virtual_board.fen()
+        return self._fen_cache
+
+    def _reachable_boards(self):
+        """
+        Returns (fen_to_move, moves, expanded) for the boards one legal move away,
+        built once per state. expanded is a (len(moves), 64) uint8 matrix whose
+        row i is the expanded board after moves[i].
+        """
+        if self._reachable is None:
+            board = self.virtual_board
+            fen_to_move = {}
+            moves = []
+            fens = []
+            # Generate once up front rather than lazily while pushing/popping
+            for move in list(board.legal_moves):
+                board.push(move)
+                fen = board.board_fen()
+                board.pop()
+                fen_to_move.setdefault(fen, move)
+                moves.append(move)
+                fens.append(fen)
+            expanded = np.frombuffer(
+                "".join(fens).translate(_FEN_EXPAND).encode(), dtype=np.uint8
+            ).reshape(len(fens), 64)
+            self._reachable = (fen_to_move, moves, expanded)
+        return self._reachable
+
+    def _find_exact_move(self, board_part, target, base):
+        """
+        Returns the legal move that turns the virtual board into board_part, or None.
+        Any such move vacates its origin square, so only moves starting on a
+        square where the read differs from the board are tried.
+        """
+        if target.size != 64:
+            return None
+        changed = np.flatnonzero(_expand_fen(base) != target)
+        # Expanded index 0 is a8, 63 is h1
+        from_mask = 0
+        for i in changed.tolist():
+            from_mask |= chess.BB_SQUARES[chess.square(i % 8, 7 - i // 8)]
+        board = self.virtual_board
+        for move in list(board.generate_legal_moves(from_mask=from_mask)):
+            board.push(move)
+            matched = board.board_fen() == board_part
+            board.pop()
+            if matched:
+                return move
+        return None
 
     def _sync_to_board_part(self, board_part):
         """
         Attempts to find a legal move that leads to board_part.
         Tolerates up to 2 misread squares via fuzzy matching and fuzzy "stay".
         """
+        # Expanded once per call; every candidate below is diffed against it
+        target = _expand_fen(board_part)
+        
+        # The board is unchanged until a move is pushed below
+        base = self._board_fen()
+        
         # 1. Exact match for current state
-        if self.virtual_board.board_fen() == board_part:
+        if base == board_part:
+            self._desync_frames = 0
+            return True
+
+        # Seen this read against this exact state before: reuse the verdict
+        key = (base, board_part)
+        cached = self._sync_cache.get(key)
+        if cached is True:
             self._desync_frames = 0
             return True
+        if cached is not None:
+            return self._handle_desync(board_part, base, cached)
 
         # 2. Check for the start position (Reset)
-        start_board = chess.Board().board_fen()
-        if board_part == start_board:
-            if self.virtual_board.board_fen() != start_board:
-                print("Game reset detected. Resetting virtual board.")
+        if board_part == self._START_BOARD_FEN:
+            if base != self._START_BOARD_FEN:
+                log.info("Game reset detected. Resetting virtual board.")
                 self.virtual_board.reset()
+                self._board_changed()
             self._desync_frames = 0
             return True
 
         # 3. Exact match for legal moves
-        for move in self.virtual_board.legal_moves:
+        if self._reachable is not None:
+            move = self._reachable[0].get(board_part)
+        else:
+            move = self._find_exact_move(board_part, target, base)
+        if move is not None:
             self.virtual_board.push(move)
-            if self.virtual_board.board_fen() == board_part:
-                print(f"Detected move: {move.uci()} (exact match)")
-                self.move_detected.emit()
-                self._desync_frames = 0
-                return True
-            self.virtual_board.pop()
+            log.info("Detected move: %s (exact match)", move)
+            self._board_changed()
+            self.move_detected.emit()
+            self._last_emitted = (None, None)
+            self._desync_frames = 0
+            return True
 
         # 4. Fuzzy Match for current state (Tolerate vision noise on same board)
-        curr_diff = self._board_diff_count(self.virtual_board.board_fen(), board_part)
+        curr_diff = _expanded_diff(target, base)
         if curr_diff <= 2:
+            self._sync_cache[key] = True
             self._desync_frames = 0
             return True
 
-        # 5. Fuzzy Match for legal moves
+        # 5. Fuzzy Match for legal moves: diff the read against every
+        # reachable board in one vectorized pass
+        _, moves, expanded = self._reachable_boards()
         best_fuzzy_move = None
         min_diff = 99
-        
-        for move in self.virtual_board.legal_moves:
-            self.virtual_board.push(move)
-            diff = self._board_diff_count(self.virtual_board.board_fen(), board_part)
-            if diff < min_diff:
-                min_diff = diff
-                best_fuzzy_move = move
-            self.virtual_board.pop()
-            
+        if moves and target.size == 64:
+            diffs = np.count_nonzero(expanded != target, axis=1)
+            best = int(diffs.argmin())
+            min_diff = int(diffs[best])
+            best_fuzzy_move = moves[best]
+
         if best_fuzzy_move and min_diff <= 2:
             self.virtual_board.push(best_fuzzy_move)
-            print(f"Detected move: {best_fuzzy_move.uci()} (fuzzy match, diff={min_diff})")
+            log.info("Detected move: %s (fuzzy match, diff=%d)", best_fuzzy_move, min_diff)
+            self._board_changed()
             self.move_detected.emit()
+            self._last_emitted = (None, None)
             self._desync_frames = 0
             return True
 
         # 6. Desync Handling
+        if len(self._sync_cache) >= 256:  # A long desync on noisy reads
+            self._sync_cache.clear()
+        self._sync_cache[key] = min_diff
+        return self._handle_desync(board_part, base, min_diff)
+
+    def _handle_desync(self, board_part, base, min_diff):
+        """Counts a frame that matched no legal continuation; snaps to it if it persists."""
         self._desync_frames += 1
-        if self._desync_frames % 10 == 0:
-            print(f"[DEBUG] Desync for {self._desync_frames} frames. Closest legal diff was {min_diff}.")
-            print(f"  Seen: {board_part}")
-            print(f"  State: {self.virtual_board.board_fen()}")
+        if self._desync_frames % 10 == 0 and log.isEnabledFor(logging.DEBUG):
+            log.debug("Desync for %d frames, min_diff=%d, seen=%s, state=%s",
+                      self._desync_frames, min_diff, board_part, base)
 
         if self._desync_frames > 40: # ~6 seconds
-             print(f"CRITICAL: Persistent desync ({self._desync_frames} frames). Attempting recovery snap...")
-             my_side = 'w' if self.side == 'white' else 'b'
-             opp_side = 'b' if self.side == 'white' else 'w'
+             log.warning("Persistent desync (%d frames). Attempting recovery snap...", self._desync_frames)
+             # Snapping is the last resort. We accept it only if we see at least 1 king
+             # of each color; check that (one pass over the read) before paying
+             # for a Board parse.
+             pieces = Counter(board_part)
+             k_count = pieces['k']
+             K_count = pieces['K']
+             if k_count < 1 or K_count < 1:
+                 log.warning("Recovery stalled: Vision sees %d white / %d black king(s).", K_count, k_count)
+                 return False
              
-             # Log King counts for debugging
-             k_count = board_part.count('k') + board_part.count('K')
-             if k_count < 2:
-                 print(f"  Recovery stalled: Vision only sees {k_count} king(s) on board.")
-             
-             for s in [my_side, opp_side]:
+             for s in (self._my_side_code, self._opp_side_code):
                  test_fen = f"{board_part} {s} - - 0 1"
                  try:
                      b = chess.Board(test_fen)
-                     # Snapping is the last resort. We accept it if we see at least 1 king of each color
-                     # (or at least 2 kings total if we can't distinguish due to noise)
-                     if board_part.count('k') >= 1 and board_part.count('K') >= 1:
-                         print(f"Recovery SUCCESS: Snapping to {s} to move.")
-                         self.virtual_board = b
-                         self.last_analyzed_board = None # Force re-analysis
-                         self._desync_frames = 0
-                         return True
-                 except: continue
+                 except ValueError as e:
+                     log.warning("Recovery snap rejected %s: %s", test_fen, e)
+                     continue
+                 log.info("Recovery SUCCESS: Snapping to %s to move.", s)
+                 self.virtual_board = b
+                 self._board_changed()
+                 self.last_analyzed_board = None # Force re-analysis
+                 self._last_analyzed_read = None
+                 self._desync_frames = 0
+                 return True
         
         return False
 
+    def _push_read(self, board_part):
+        """Adds a read to the rolling window, keeping the vote tally in step."""
+        reads = self.recent_reads
+        counts = self._read_counts
+        if len(reads) == reads.maxlen:
+            evicted = reads[0]
+            remaining = counts[evicted] - 1
+            if remaining:
+                counts[evicted] = remaining
+            else:
+                del counts[evicted]
+            if evicted == self._best_read:
+                self._best_read = None  # May no longer lead; recomputed below
+        reads.append(board_part)  # maxlen evicts the oldest
+        count = counts.get(board_part, 0) + 1
+        counts[board_part] = count
+        
+        best = self._best_read
+        if best is None:
+            self._best_read = max(counts, key=counts.get)
+        elif count > counts[best]:
+            self._best_read = board_part
+
+    def _clear_reads(self):
+        """Empties the rolling window and its tally."""
+        self.recent_reads.clear()
+        self._read_counts.clear()
+        self._best_read = None
+
     def _get_most_common_board(self):
         """Return the most common board reading from the rolling window, or None."""
-        if not self.recent_reads:
-            return None
-        from collections import Counter
-        counts = Counter(self.recent_reads)
-        board, count = counts.most_common(1)[0]
-        if count >= CONFIRM_THRESHOLD:
-            return board
+        best = self._best_read
+        if best is not None and self._read_counts[best] >= CONFIRM_THRESHOLD:
+            return best
         return None
 
+    def _cancel_analysis(self):
+        """Abandons the in-flight engine search; its result will be ignored."""
+        if self._pending_analysis is None:
+            return
+        self._pending_analysis.cancel()
+        self.engine.cancel()
+        self._pending_analysis = None
+        self._pending_fen = None
+        self.last_analyzed_board = None
+        self._last_analyzed_read = None
+
+    def _is_valid_suggestion(self, best_move):
+        """
+        Sanity-checks an engine move for the current virtual board.
+        Stockfish only returns legal moves for the FEN it was given, so the full
+        legality check only runs when strict_validate is enabled.
+        """
+        if len(best_move) not in (4, 5) or best_move[0] not in "abcdefgh":
+            return False
+        if self.strict_validate:
+            return chess.Move.from_uci(best_move) in self.virtual_board.legal_moves
+        return True
+
+    def _collect_analysis(self):
+        """Validates and emits the result of a finished engine search, if any."""
+        future = self._pending_analysis
+        if future is None or not future.done():
+            return
+        fen = self._pending_fen
+        self._pending_analysis = None
+        self._pending_fen = None
+        self._handle_result(fen, future.result())
+
+    def _handle_result(self, fen, best_move):
+        """Validates an engine move for fen and emits it (caching it for repeats)."""
+        if best_move:
+            try:
+                if self._full_fen() != fen:
+                    log.debug("Discarding stale suggestion %s", best_move)
+                    self.last_analyzed_board = None
+                    self._last_analyzed_read = None
+                elif not self._is_valid_suggestion(best_move):
+                    log.warning("Engine suggested illegal move %s", best_move)
+                    self.last_analyzed_board = None
+                    self._last_analyzed_read = None
+                else:
+                    self._analysis_cache[fen] = best_move
+                    self._analysis_cache.move_to_end(fen)
+                    if len(self._analysis_cache) > ANALYSIS_CACHE_SIZE:
+                        self._analysis_cache.popitem(last=False)
+                    # Skip re-sending a suggestion the GUI is already showing
+                    if (fen, best_move) != self._last_emitted:
+                        log.info("Suggestion: %s ✓", best_move)
+                        self.fen_updated.emit(fen, best_move)
+                        self._last_emitted = (fen, best_move)
+            except Exception as e:
+                log.warning("Analysis validation error: %s", e)
+                self.last_analyzed_board = None
+                self._last_analyzed_read = None
+        else:
+            log.warning("Engine analysis failed (None returned)")
+            self.last_analyzed_board = None
+            self._last_analyzed_read = None
+
+    def _idle_delay(self):
+        """Slows capture while waiting on a static board, backing off the longer it stays put."""
+        if self._pending_analysis:
+            # Poll quickly so a finished search is shown promptly
+            self._poll_ms = 50
+            return
+        self._idle_steps = min(self._idle_steps + 1, IDLE_MAX_STEPS)
+        self._poll_ms = IDLE_SLEEP_STEP * self._idle_steps
+
     def run(self):
         self.running = True
-        print(f"Analysis started. Playing as: {self.side}")
+        log.info("Analysis started. Playing as: %s", self.side)
+        self._my_side_code = 'w' if self.side == 'white' else 'b'
+        self._opp_side_code = 'b' if self.side == 'white' else 'w'
+        
+        self._wake.clear()
+        # Fresh queues so nothing from a previous session leaks in
+        self.frame_q = queue.Queue(maxsize=1)
+        self.free_frames = queue.SimpleQueue()
+        self.read_q = queue.Queue(maxsize=STAGE_QUEUE_SIZE)
+        stages = [_CaptureThread(self), _VisionThread(self)]
+        for stage in stages:
+            stage.start()
+        try:
+            self._run_sync_stage()
+        finally:
+            self.running = False
+            for stage in stages:
+                stage.wait()
+
+    def _run_sync_stage(self):
         while self.running:
-            if not self.region:
-                self.msleep(500)
-                continue
+            # Pick up a finished background search before reading the board
+            self._collect_analysis()
             
-            # 1. Capture Board
-            frame = self.capture_tool.capture(self.region)
-            
-            # 2. Get FEN
-            raw_fen = self.vision.get_board_state(frame, self.side)
+            # 1-2. Capture and vision happen upstream; take the next read
+            try:
+                board_part = self.read_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
             
-            if not raw_fen:
-                self.recent_reads.clear()
+            if not board_part:
+                self._clear_reads()
                 self._stall_counter += 1
                 if self._stall_counter % DEBUG_INTERVAL == 0:
-                    print(f"[DEBUG] Vision returned None ({self._stall_counter} frames)")
-                self.msleep(150)
+                    log.debug("Vision returned None (%d frames)", self._stall_counter)
+                self._poll_ms = 150
                 continue
             
-            # Extract just the board part for comparison
-            board_part = raw_fen.split()[0]
+            # Interning makes repeated reads the same object, so window
+            # counting and the equality checks below short-circuit on identity.
+            board_part = sys.intern(board_part)
             
             # 3. Rolling window confirmation
-            self.recent_reads.append(board_part)
-            if len(self.recent_reads) > WINDOW_SIZE:
-                self.recent_reads.pop(0)
+            self._push_read(board_part)
             
             confirmed_board = self._get_most_common_board()
             if confirmed_board is None:
-                self.msleep(80)
+                self._poll_ms = 80
                 continue
             
-            # 4. State Tracking & Sync
-            if not self._sync_to_board_part(confirmed_board):
-                self.msleep(100)
+            # Same read we already analyzed: nothing can have changed, so skip
+            # the sync and FEN serialization entirely
+            if confirmed_board == self._last_analyzed_read:
+                self._idle_delay()
                 continue
             
+            # 4. State Tracking & Sync (a repeat of the last synced read
+            # cannot have moved the board, so skip the legal-move search)
+            if confirmed_board != self._last_confirmed_board:
+                if not self._sync_to_board_part(confirmed_board):
+                    self._poll_ms = 100
+                    continue
+                self._last_confirmed_board = confirmed_board
+                self._idle_steps = 0  # Board changed: back to full polling rate
+                
+                # The board moved on while the engine was still thinking
+                if self._pending_analysis and self._full_fen() != self._pending_fen:
+                    self._cancel_analysis()
+            
             self._desync_frames = 0 # In sync
             
             # 5. Turn Gating
-            my_side_code = 'w' if self.side == 'white' else 'b'
             current_turn = 'w' if self.virtual_board.turn else 'b'
             
-            if current_turn != my_side_code:
+            if current_turn != self._my_side_code:
                 status = "Waiting for opponent move..."
                 if self._last_logged_status != status:
-                    print(status)
+                    log.info(status)
                     self._last_logged_status = status
-                self.msleep(300)
+                self._idle_delay()
                 continue
 
             # 6. Don't re-analyze same board state
             # Note: last_analyzed_board now stores the full internal FEN to be precise
-            current_full_fen = self.virtual_board.fen()
+            current_full_fen = self._full_fen()
             if current_full_fen == self.last_analyzed_board:
                 status = "Waiting for your move..."
                 if self._last_logged_status != status:
                     # Only print this if we just finished an analysis or resumed
                     self._last_logged_status = status
-                self.msleep(300)
+                self._idle_delay()
                 continue
 
             self._last_logged_status = "Analyzing..."
             self.last_analyzed_board = current_full_fen
-            print(f"Your turn. Analyzing: {current_full_fen}")
+            self._last_analyzed_read = confirmed_board
+            log.info("Your turn. Analyzing: %s", current_full_fen)
             
-            # 7. Analyze
-            best_move = self.engine.analyze(current_full_fen, time_limit=1.0)
+            # 7. Reuse the move for a position seen before (takebacks, repeats)
+            cached_move = self._analysis_cache.get(current_full_fen)
+            if cached_move is not None:
+                self._handle_result(current_full_fen, cached_move)
+                self._poll_ms = 100
+                continue
             
-            if best_move:
-                # 8. Double-check move legality on our virtual board
-                try:
-                    move = chess.Move.from_uci(best_move)
-                    if move in self.virtual_board.legal_moves:
-                        print(f"Suggestion: {best_move} ✓")
-                        self.fen_updated.emit(current_full_fen, best_move)
-                    else:
-                        print(f"Warning: Engine suggested illegal move {best_move}")
-                        self.last_analyzed_board = None
-                except Exception as e:
-                    print(f"Analysis validation error: {e}")
-                    self.last_analyzed_board = None
-            else:
-                print("Engine analysis failed (None returned)")
-                self.last_analyzed_board = None
+            # Otherwise analyze in the background; the result is collected (and
+            # legality-checked) by _collect_analysis on a later iteration
+            self._pending_fen = current_full_fen
+            self._pending_analysis = self.engine.analyze_async(current_full_fen, time_limit=1.0)
             
-            self.msleep(100)
+            self._poll_ms = 100
+
 
 
+    def clear_analysis_cache(self):
+        """
+        Forgets remembered engine moves. Not thread-safe: call only while the
+        thread is stopped (the GUI keeps calibration disabled while it runs).
+        """
+        self._analysis_cache.clear()
+
+    def set_region(self, region):
+        """Sets the board region (x, y, w, h) and wakes a capture stage waiting for one."""
+        self.region = region
+        self._wake.set()
 
     def stop(self):
         self.running = False
+        self._wake.set()
         self.wait()
+        self._cancel_analysis()
 
 class ControlWindow(QWidget):
     def __init__(self):
@@ -262,10 +631,14 @@ class ControlWindow(QWidget):
         # Overlay
         self.overlay = None
         self.selected_rect = None
+        self._board_qrect = None
+        self._orientation = 'white'
         
         # Analysis Thread
         self.analysis_thread = AnalysisThread(self.capture_tool, self.vision, self.engine)
-        self.analysis_thread.fen_updated.connect(self.update_info)
+        # Queued across threads; Unique so a repeated connect can't double-draw
+        self.analysis_thread.fen_updated.connect(self.update_info, Qt.ConnectionType(
+            Qt.ConnectionType.QueuedConnection.value | Qt.ConnectionType.UniqueConnection.value))
         self.analysis_thread.move_detected.connect(self.clear_overlay)
 
         self.init_ui()
@@ -334,11 +707,9 @@ class ControlWindow(QWidget):
         self.btn_stop.clicked.connect(self.stop_analysis)
 
     def select_area(self):
-        print("Select Area Clicked")
+        log.info("Select Area Clicked")
         self.status_label.setText("Status: Selecting Area...")
         
-        from gui.overlay import OverlayWindow
-        
         if self.overlay is None:
             self.overlay = OverlayWindow()
             self.overlay.area_selected.connect(self.on_area_selected)
@@ -347,9 +718,12 @@ class ControlWindow(QWidget):
 
     def on_area_selected(self, rect):
         self.selected_rect = (rect.x(), rect.y(), rect.width(), rect.height())
+        self._board_qrect = QRect(rect)  # Same region, ready for the overlay
         self.status_label.setText(f"Area Selected: {rect.width()}x{rect.height()}")
-        self.analysis_thread.region = self.selected_rect
-        self.btn_calibrate.setEnabled(True)
+        self.analysis_thread.set_region(self.selected_rect)
+        # Calibrating swaps templates and clears the thread's caches, so it
+        # stays locked until Stop (which re-enables it)
+        self.btn_calibrate.setEnabled(not self.analysis_thread.isRunning())
 
     def calibrate_board(self):
         if not self.selected_rect:
@@ -366,6 +740,8 @@ class ControlWindow(QWidget):
         orientation = 'white' if "White" in orientation_text else 'black'
         
         self.vision.calibrate(frame, orientation)
+        # Calibration means a fresh board setup; old suggestions don't carry over
+        self.analysis_thread.clear_analysis_cache()
         self.status_label.setText("Status: Calibrated!")
         self.btn_start.setEnabled(True)
 
@@ -374,7 +750,7 @@ class ControlWindow(QWidget):
             QMessageBox.warning(self, "Error", "Calibrate first!")
             return
 
-        print("Start Analysis Clicked")
+        log.info("Start Analysis Clicked")
         self.status_label.setText("Status: Analyzing")
         self.btn_start.setEnabled(False)
         self.btn_stop.setEnabled(True)
@@ -382,12 +758,13 @@ class ControlWindow(QWidget):
         
         # Update thread settings
         orientation_text = self.combo_side.currentText()
-        self.analysis_thread.side = 'white' if "White" in orientation_text else 'black'
+        self._orientation = 'white' if "White" in orientation_text else 'black'
+        self.analysis_thread.side = self._orientation
         
         self.analysis_thread.start()
 
     def stop_analysis(self):
-        print("Stop Clicked")
+        log.info("Stop Clicked")
         self.status_label.setText("Status: Stopped")
         self.analysis_thread.stop()
         self.btn_start.setEnabled(True)
@@ -406,16 +783,10 @@ class ControlWindow(QWidget):
         self.info_label.setText(f"Best Move: {best_move}")
         
         # Draw move on overlay if it's a valid move
-        if self.overlay and self.analysis_thread.region and " " not in best_move and "No Move" not in best_move:
-             # best_move string might be "e2e4" or "e2e4 (CP: 30)" (though currently it's just UCI or error msg)
-             uci_move = best_move.split()[0]
-             
-             # Orientation
-             orientation_text = self.combo_side.currentText()
-             orientation = 'white' if "White" in orientation_text else 'black'
-             
-             # self.analysis_thread.region is (x,y,w,h) tuple, connect expects tuple or list
-             self.overlay.draw_move(uci_move, self.analysis_thread.region, orientation)
+        # best_move string might be "e2e4" or "e2e4 (CP: 30)" (though currently it's just UCI or error msg)
+        uci_move = best_move.partition(' ')[0]
+        if self.overlay and self.analysis_thread.region and len(uci_move) >= 4 and uci_move[0].isalpha():
+             self.overlay.draw_move(uci_move, self._board_qrect, self._orientation)
 
     def closeEvent(self, event):
         self.analysis_thread.stop()
@@ -423,6 +794,7 @@ class ControlWindow(QWidget):
         event.accept()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     app = QApplication(sys.argv)
     window = ControlWindow()
     window.show()
@@ -1,7 +1,53 @@
+import sys
 import ctypes
-from PyQt6.QtWidgets import QWidget, QApplication, QRubberBand
-from PyQt6.QtCore import Qt, QRect, pyqtSignal
-from PyQt6.QtGui import QPainter, QColor, QPen
+from PyQt6.QtWidgets import QWidget, QApplication
+from PyQt6.QtCore import Qt, QRect, QTimer, pyqtSignal
+from PyQt6.QtGui import QPainter, QColor, QPen, QBrush, QRegion
+
+if sys.platform == 'win32':
+    from ctypes import wintypes
+    _user32 = ctypes.WinDLL('user32', use_last_error=True)
+    _GetWindowLongW = _user32.GetWindowLongW
+    _GetWindowLongW.argtypes = [wintypes.HWND, ctypes.c_int]
+    _GetWindowLongW.restype = ctypes.c_long
+    _SetWindowLongW = _user32.SetWindowLongW
+    _SetWindowLongW.argtypes = [wintypes.HWND, ctypes.c_int, ctypes.c_long]
+    _SetWindowLongW.restype = ctypes.c_long
+    _SetWindowDisplayAffinity = _user32.SetWindowDisplayAffinity
+    _SetWindowDisplayAffinity.argtypes = [wintypes.HWND, wintypes.DWORD]
+    _SetWindowDisplayAffinity.restype = wintypes.BOOL
+else:
+    _user32 = None
+
+_screen_info = None   # (geometry, refresh rate) of the primary screen
+_watched_screen = None
+
+
+def _forget_screen_info(*_):
+    global _screen_info
+    _screen_info = None
+
+
+def _primary_screen_info():
+    """Primary screen geometry and refresh rate, queried once until the screen changes."""
+    global _screen_info, _watched_screen
+    if _screen_info is None:
+        app = QApplication.instance()
+        screen = app.primaryScreen()
+        if _watched_screen is None:
+            app.primaryScreenChanged.connect(_forget_screen_info)
+        if screen is not _watched_screen:
+            screen.geometryChanged.connect(_forget_screen_info)
+            screen.refreshRateChanged.connect(_forget_screen_info)
+            _watched_screen = screen
+        _screen_info = (screen.geometry(), screen.refreshRate())
+    return _screen_info
+
+
+MARKER_H = 0.15  # Marker strip height as a fraction of the square
+
+# UCI square name (e.g. 'e4') -> (rank index, file index), both 0-7
+_UCI_SQUARES = {f + r: (int(r) - 1, i) for i, f in enumerate('abcdefgh') for r in '12345678'}
 
 class OverlayWindow(QWidget):
     area_selected = pyqtSignal(QRect)
@@ -16,27 +62,62 @@ class OverlayWindow(QWidget):
         self.setAttribute(Qt.WidgetAttribute.WA_NoSystemBackground)
         
         # Maximize to cover the whole screen for selection
-        screen_geometry = QApplication.primaryScreen().geometry()
+        screen_geometry, refresh_rate = _primary_screen_info()
         self.setGeometry(screen_geometry)
+        # One display refresh; coalesced updates below fire at most this often
+        frame_ms = max(1, int(1000 / (refresh_rate or 60)))
         
-        self.begin = None
+        self.begin = None  # Selection corners as (x, y) ints
         self.end = None
         self.is_selecting = False
+        self.best_move = None
+        self.parent_rect = None
+        self._square_rects = None  # 8x8 QRect grid for parent_rect, built on demand
+        self.orientation = 'white'
+        self._rc = self._rc_white  # Square -> grid cell mapping for orientation
+        self._src_strip = QRect()  # Marker strips for best_move, set in draw_move
+        self._dst_strip = QRect()
+
+        # Paint resources, built once rather than on every repaint
+        self._dim_brush = QBrush(QColor(0, 0, 0, 100))
+        self._src_brush = QBrush(QColor(255, 255, 0, 200))
+        self._dst_brush = QBrush(QColor(0, 255, 255, 200))
+        self._sel_pen = QPen(QColor(0, 120, 215), 1)
+        self._sel_brush = QBrush(QColor(0, 120, 215, 40))
         
-        # Rubber band for selection visual
-        self.rubber_band = QRubberBand(QRubberBand.Shape.Rectangle, self)
+        # Selection rect as last painted
+        self._shown_sel = QRect()
+
+        # Coalesce mouse moves to one selection repaint per refresh
+        self._repaint_timer = QTimer(self)
+        self._repaint_timer.setSingleShot(True)
+        self._repaint_timer.setInterval(frame_ms)
+        self._repaint_timer.timeout.connect(self._flush_geometry)
+
+        # Coalesce bursts of draw_move calls into one update per refresh
+        self._pending_draw = None
+        self._draw_timer = QTimer(self)
+        self._draw_timer.setSingleShot(True)
+        self._draw_timer.setInterval(frame_ms)
+        self._draw_timer.timeout.connect(self._apply_pending)
+
+        # Last state applied through Win32, so repeat requests skip the calls
+        self._click_through = None
+        self._capture_excluded = None
 
     def set_click_through(self, enable: bool):
         """
         Sets the window to be transparent to mouse events using Windows API.
         """
+        if _user32 is None or enable == self._click_through:
+            return
         hwnd = int(self.winId())
         GWL_EXSTYLE = -20
         WS_EX_TRANSPARENT = 0x00000020
         WS_EX_LAYERED = 0x00080000
 
         # Get current style
-        style = ctypes.windll.user32.GetWindowLongW(hwnd, GWL_EXSTYLE)
+        style = _GetWindowLongW(hwnd, GWL_EXSTYLE)
         
         if enable:
             # Add Transparent and Layered flags
@@ -45,115 +126,208 @@ class OverlayWindow(QWidget):
             # Remove Transparent flag
             style = style & ~WS_EX_TRANSPARENT
             
-        ctypes.windll.user32.SetWindowLongW(hwnd, GWL_EXSTYLE, style)
+        _SetWindowLongW(hwnd, GWL_EXSTYLE, style)
+        self._click_through = enable
 
     def set_capture_exclusion(self, enable: bool):
         """
         Excludes this window from screen capture (mss/OBS/etc) while keeping it visible to the user.
         Uses SetWindowDisplayAffinity (Windows 10+).
         """
+        if _user32 is None or enable == self._capture_excluded:
+            return
         hwnd = int(self.winId())
         WDA_NONE = 0x00000000
         WDA_EXCLUDEFROMCAPTURE = 0x00000011 # Windows 10 version 2004+
         
         affinity = WDA_EXCLUDEFROMCAPTURE if enable else WDA_NONE
-        try:
-            ctypes.windll.user32.SetWindowDisplayAffinity(hwnd, affinity)
-        except Exception as e:
-            print(f"Error setting display affinity: {e}")
+        if not _SetWindowDisplayAffinity(hwnd, affinity):
+            print(f"Error setting display affinity: {ctypes.WinError(ctypes.get_last_error())}")
+            return
+        self._capture_excluded = enable
 
     def clear(self):
         """Removes move markers from screen."""
+        self._draw_timer.stop()
+        self._pending_draw = None
+        if self.best_move is None:
+            return
+        dirty = self._marker_area()
         self.best_move = None
-        self.update()
+        self._square_rects = None
+        self.update(dirty)
+
+    def setVisible(self, visible):
+        if not visible:
+            # A draw queued before hide() must not bring the window back
+            self._draw_timer.stop()
+            self._pending_draw = None
+        super().setVisible(visible)
 
     def start_selection_mode(self):
+        self._draw_timer.stop()
+        self._pending_draw = None
         self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents, False)
+        self.clearMask()  # The dim covers the whole screen
         self.set_capture_exclusion(False) # Ensure visible during selection
         self.show()
         self.setCursor(Qt.CursorShape.CrossCursor)
+        self.begin = None  # Don't paint the previous selection
+        self.end = None
         self.is_selecting = True
         self.update()
 
     def draw_move(self, move_uci, board_rect, orientation='white'):
         """
-        Draws the best move on the overlay.
+        Draws the best move on the overlay. Only the latest of several calls
+        within one display refresh is drawn.
+        :param board_rect: Board region as a QRect, or an (x, y, w, h) sequence.
         """
+        if not isinstance(board_rect, QRect):
+            board_rect = QRect(int(board_rect[0]), int(board_rect[1]),
+                               int(board_rect[2]), int(board_rect[3]))
+        if self._pending_draw is None and self._is_shown(move_uci, board_rect, orientation):
+            return
+        self._pending_draw = (move_uci, board_rect, orientation)
+        if not self._draw_timer.isActive():
+            self._draw_timer.start()
+
+    def _is_shown(self, move_uci, board_rect, orientation):
+        """True if exactly this move is already on screen."""
+        return (not self.is_selecting and self.isVisible()
+                and move_uci == self.best_move
+                and board_rect == self.parent_rect
+                and orientation == self.orientation)
+
+    def _apply_pending(self):
+        if self._pending_draw is None:
+            return
+        move_uci, board_rect, orientation = self._pending_draw
+        self._pending_draw = None
+        if self._is_shown(move_uci, board_rect, orientation):
+            return
         self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents, True)
         self.best_move = move_uci
-        self.parent_rect = QRect(*board_rect)
+        if self._square_rects is None or board_rect != self.parent_rect:
+            self._square_rects = self._build_square_rects(board_rect)
+        self.parent_rect = board_rect
         self.orientation = orientation
+        self._rc = self._rc_white if orientation == 'white' else self._rc_black
+        # Shrink the window to the two marked squares so only they are
+        # repainted and composited, not a screen-sized translucent surface
+        self._src_strip = self._marker_strip(self.get_square_rect(move_uci[:2]))
+        self._dst_strip = self._marker_strip(self.get_square_rect(move_uci[2:4]))
+        self.setMask(QRegion(self._src_strip).united(QRegion(self._dst_strip)))
         self.is_selecting = False
         self.setCursor(Qt.CursorShape.ArrowCursor)
         self.set_capture_exclusion(True) # Hide from mss
         self.show()
         self.update()
 
+    def _marker_area(self):
+        """Screen area covered by the current move's markers (empty if none)."""
+        if not self.best_move or not self.parent_rect:
+            return QRect()
+        return self._src_strip.united(self._dst_strip)
+
+    @staticmethod
+    def _marker_strip(square_rect):
+        """The strip along the bottom edge of a square that marks it."""
+        h = square_rect.height()
+        return QRect(square_rect.x(), square_rect.y() + int(h * (1.0 - MARKER_H)),
+                     square_rect.width(), int(h * MARKER_H))
+
     def mousePressEvent(self, event):
         if self.is_selecting:
-            self.begin = event.pos()
-            self.end = self.begin
-            self.rubber_band.setGeometry(QRect(self.begin, self.end))
-            self.rubber_band.show()
+            pos = event.pos()
+            self.begin = self.end = (pos.x(), pos.y())
+            self._shown_sel = self._selection_rect()
+            self.update(self._shown_sel.adjusted(-2, -2, 2, 2))
 
     def mouseMoveEvent(self, event):
         if self.is_selecting and self.begin:
-            self.end = event.pos()
-            self.rubber_band.setGeometry(QRect(self.begin, self.end).normalized())
+            pos = event.pos()
+            self.end = (pos.x(), pos.y())
+            if not self._repaint_timer.isActive():
+                self._repaint_timer.start()
+
+    def _flush_geometry(self):
+        if not (self.is_selecting and self.begin):
+            return
+        sel = self._selection_rect()
+        # Only the area the selection moved over needs repainting
+        self.update(sel.united(self._shown_sel).adjusted(-2, -2, 2, 2))
+        self._shown_sel = sel
 
     def mouseReleaseEvent(self, event):
         if self.is_selecting and self.begin:
-            self.end = event.pos()
-            self.rubber_band.hide()
-            selection_rect = QRect(self.begin, self.end).normalized()
+            self._repaint_timer.stop()
+            pos = event.pos()
+            self.end = (pos.x(), pos.y())
+            selection_rect = self._selection_rect()
             global_rect = QRect(self.mapToGlobal(selection_rect.topLeft()), selection_rect.size())
             self.area_selected.emit(global_rect)
             self.is_selecting = False
             self.close()
 
+    def _selection_rect(self):
+        """Normalized selection rect with both corners inclusive."""
+        (x0, y0), (x1, y1) = self.begin, self.end
+        return QRect(min(x0, x1), min(y0, y1), abs(x1 - x0) + 1, abs(y1 - y0) + 1)
+
     def get_square_rect(self, square_uci):
         if not self.best_move or not self.parent_rect:
             return QRect()
             
-        col_map = {'a': 0, 'b': 1, 'c': 2, 'd': 3, 'e': 4, 'f': 5, 'g': 6, 'h': 7}
-        file_idx = col_map[square_uci[0]]
-        rank_idx = int(square_uci[1]) - 1
-        
-        if self.orientation == 'white':
-            r = 7 - rank_idx
-            c = file_idx
-        else:
-            r = rank_idx
-            c = 7 - file_idx
-            
-        square_w = self.parent_rect.width() / 8
-        square_h = self.parent_rect.height() / 8
-        x = self.parent_rect.x() + (c * square_w)
-        y = self.parent_rect.y() + (r * square_h)
-        return QRect(int(x), int(y), int(square_w), int(square_h))
+        r, c = self._rc(*_UCI_SQUARES[square_uci])
+        return self._square_rects[r][c]
+
+    # (rank index, file index) -> (screen row, screen column), chosen in draw_move
+    @staticmethod
+    def _rc_white(rank_idx, file_idx):
+        return 7 - rank_idx, file_idx
+
+    @staticmethod
+    def _rc_black(rank_idx, file_idx):
+        return rank_idx, 7 - file_idx
+
+    @staticmethod
+    def _build_square_rects(board_rect):
+        """
+        Precomputes the 8x8 grid of screen rects for a board region, using
+        integer square sizes like BoardVision.split_board does.
+        """
+        square_w = board_rect.width() // 8
+        square_h = board_rect.height() // 8
+        x0, y0 = board_rect.x(), board_rect.y()
+        return [[QRect(x0 + c * square_w, y0 + r * square_h, square_w, square_h)
+                 for c in range(8)] for r in range(8)]
 
     def paintEvent(self, event):
         painter = QPainter(self)
         if self.is_selecting:
-            painter.setBrush(QColor(0, 0, 0, 100))
-            painter.drawRect(self.rect())
+            painter.setBrush(self._dim_brush)
+            painter.setPen(Qt.PenStyle.NoPen)
             if self.begin and self.end:
-                painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Clear)
-                painter.drawRect(QRect(self.begin, self.end).normalized())
+                # Dim only the four strips around the selection, leaving it clear
+                w, h = self.width(), self.height()
+                sel = self._selection_rect()
+                left, top = sel.x(), sel.y()
+                right, bottom = left + sel.width(), top + sel.height()
+                painter.drawRect(0, 0, w, top)
+                painter.drawRect(0, top, left, sel.height())
+                painter.drawRect(right, top, w - right, sel.height())
+                painter.drawRect(0, bottom, w, h - bottom)
+                # The selection itself, drawn here rather than by a child rubber band
+                painter.setPen(self._sel_pen)
+                painter.setBrush(self._sel_brush)
+                painter.drawRect(sel.adjusted(0, 0, -1, -1))
+            else:
+                painter.drawRect(self.rect())
         elif self.best_move and self.parent_rect:
-            src = self.best_move[:2]
-            dst = self.best_move[2:4]
-            MARKER_H = 0.15 
-            
-            src_rect = self.get_square_rect(src)
-            src_strip = QRect(src_rect.x(), src_rect.y() + int(src_rect.height() * (1.0 - MARKER_H)), 
-                              src_rect.width(), int(src_rect.height() * MARKER_H))
-            painter.setBrush(QColor(255, 255, 0, 200))
+            # Strips are laid out in draw_move; painting just fills them
             painter.setPen(Qt.PenStyle.NoPen)
-            painter.drawRect(src_strip)
-            
-            dst_rect = self.get_square_rect(dst)
-            dst_strip = QRect(dst_rect.x(), dst_rect.y() + int(dst_rect.height() * (1.0 - MARKER_H)), 
-                              dst_rect.width(), int(dst_rect.height() * MARKER_H))
-            painter.setBrush(QColor(0, 255, 255, 200))
-            painter.drawRect(dst_strip)
+            painter.setBrush(self._src_brush)
+            painter.drawRect(self._src_strip)
+            painter.setBrush(self._dst_brush)
+            painter.drawRect(self._dst_strip)
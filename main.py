@@ -1,8 +1,10 @@
 import sys
+import logging
 from PyQt6.QtWidgets import QApplication
 from gui.control_window import ControlWindow
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     app = QApplication(sys.argv)
     window = ControlWindow()
     window.show()
@@ -1,4 +1,5 @@
 import sys
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import chess
 import mss
@@ -16,11 +17,16 @@ def test_imports():
     print(f"Numpy: {numpy.__version__}")
     print("PyQt6 imported successfully")
 
-def test_engine():
+def start_engine():
+    engine = ChessEngine()
+    engine.start()
+    return engine
+
+def test_engine(engine_future=None):
     print("\nTesting Stockfish Engine...")
     try:
-        engine = ChessEngine()
-        engine.start()
+        # Without a background start (e.g. when run on its own), start it here
+        engine = engine_future.result() if engine_future else start_engine()
         
         # Test analysis
         fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
@@ -33,5 +39,8 @@ def test_engine():
         print(f"Engine test failed: {e}")
 
 if __name__ == "__main__":
-    test_imports()
-    test_engine()
+    # Stockfish boots in the background while the import checks run
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        engine_future = pool.submit(start_engine)
+        test_imports()
+        test_engine(engine_future)